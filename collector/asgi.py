@@ -3,10 +3,14 @@ ASGI config for collector project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live metrics feed (``/metrics/live/``) holds connections open and must be
+served through this entry point (e.g. ``uvicorn collector.asgi:application``).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
@@ -14,3 +18,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'collector.settings')
 
 application = get_asgi_application()
+
+# Warm the latest-values cache so the first /metrics/latest/ request skips the full load
+from metrics.latest import latest_values  # noqa: E402
+
+try:
+    latest_values.warm()
+except Exception as e:
+    logging.getLogger(__name__).warning(f"Could not warm latest values cache: {str(e)}")
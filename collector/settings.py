@@ -117,3 +117,21 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Retention policies for `manage.py compact_metrics`, keyed by metric name.
+# Only metrics listed here are compacted; with no entries the command does
+# nothing. Rows older than downsample_after_days are rolled up into one row
+# per downsample_to bucket using the aggregate ('last', 'mean', 'min' or
+# 'max'); rows older than delete_after_days are deleted. Use None to disable
+# either step. Example:
+#
+#     METRIC_RETENTION_POLICIES = {
+#         'put_call_ratio': {
+#             'downsample_after_days': 365,
+#             'downsample_to': '7D',
+#             'aggregate': 'mean',
+#             'delete_after_days': 3650,
+#         },
+#     }
+METRIC_RETENTION_POLICIES = {}
@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import logging
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -14,3 +15,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'collector.settings')
 
 application = get_wsgi_application()
+
+# Warm the latest-values cache so the first /metrics/latest/ request skips the full load
+from metrics.latest import latest_values  # noqa: E402
+
+try:
+    latest_values.warm()
+except Exception as e:
+    logging.getLogger(__name__).warning(f"Could not warm latest values cache: {str(e)}")
@@ -0,0 +1,165 @@
+import threading
+
+import numpy as np
+import pandas as pd
+from django.db.models import Count, Q
+
+from .models import MarketMetrics
+from .timestamps import EASTERN_TZ, start_of_day
+
+CORRELATION_PAIR = ('nq_close', 'vix_level')
+MAX_CACHED_RESULTS = 256
+
+
+def rolling_stats(values, window):
+    """Rolling mean, volatility of returns and z-score of a value series"""
+    mean = values.rolling(window).mean()
+    std = values.rolling(window).std()
+    return pd.DataFrame({
+        'value': values,
+        'rolling_mean': mean,
+        'volatility': values.pct_change(fill_method=None).rolling(window).std(),
+        'zscore': (values - mean) / std.replace(0, np.nan),
+    })
+
+
+class _CachedSeries:
+    def __init__(self, frame, watermark):
+        self.frame = frame
+        self.watermark = watermark
+
+    @property
+    def version(self):
+        return self.watermark, len(self.frame)
+
+
+class RollingAnalytics:
+    """Rolling statistics cached per (metric, window, range).
+
+    Each refresh loads only rows written since the cached watermark, in one
+    query for all requested metrics. Rows that extend a series recompute just
+    the trailing windows; corrections to older rows recompute that series.
+    A per-metric row count catches deletions (e.g. compaction), which leave
+    no updated_at trace, and forces a full reload of that series.
+    """
+
+    def __init__(self):
+        self._series = {}
+        self._correlations = {}
+        self._lock = threading.Lock()
+
+    def get(self, metric_names, window, start_date=None, end_date=None):
+        """Return ({metric_name: DataFrame}, correlation Series or None)"""
+        with self._lock:
+            cached = {
+                name: self._series.get((name, window, start_date, end_date))
+                for name in metric_names
+            }
+            changes = self._load_changes(cached, start_date, end_date)
+            for name, rows in changes.items():
+                cached[name] = self._refresh(cached[name], rows, window)
+
+            row_counts = self._row_counts(metric_names, start_date, end_date)
+            stale = {
+                name: None for name, entry in cached.items()
+                if len(entry.frame) != row_counts.get(name, 0)
+            }
+            if stale:
+                for name, rows in self._load_changes(stale, start_date, end_date).items():
+                    cached[name] = self._refresh(None, rows, window)
+
+            for name, entry in cached.items():
+                self._remember(self._series, (name, window, start_date, end_date), entry)
+
+            correlation = None
+            if all(name in cached for name in CORRELATION_PAIR):
+                correlation = self._correlation(cached, window, start_date, end_date)
+
+        return {name: entry.frame for name, entry in cached.items()}, correlation
+
+    def _load_changes(self, cached, start_date, end_date):
+        query = Q()
+        for name, entry in cached.items():
+            if entry is None or entry.watermark is None:
+                query |= Q(metric_name=name)
+            else:
+                query |= Q(metric_name=name, updated_at__gt=entry.watermark)
+
+        queryset = MarketMetrics.objects.filter(query)
+        if start_date:
+            queryset = queryset.filter(timestamp__gte=start_of_day(start_date))
+        if end_date:
+            queryset = queryset.filter(timestamp__lt=start_of_day(end_date))
+
+        rows = pd.DataFrame.from_records(
+            list(queryset.values_list('metric_name', 'timestamp', 'metric_value', 'updated_at')),
+            columns=['metric_name', 'timestamp', 'value', 'updated_at'],
+        )
+        changes = {name: rows.iloc[0:0] for name, entry in cached.items() if entry is None}
+        changes.update({name: group for name, group in rows.groupby('metric_name')})
+        return changes
+
+    def _row_counts(self, metric_names, start_date, end_date):
+        queryset = MarketMetrics.objects.filter(metric_name__in=metric_names)
+        if start_date:
+            queryset = queryset.filter(timestamp__gte=start_of_day(start_date))
+        if end_date:
+            queryset = queryset.filter(timestamp__lt=start_of_day(end_date))
+        return dict(queryset.values('metric_name').annotate(rows=Count('id')).values_list('metric_name', 'rows'))
+
+    def _refresh(self, entry, rows, window):
+        values = pd.Series(
+            pd.to_numeric(rows['value'], errors='coerce').to_numpy(dtype=float),
+            index=pd.DatetimeIndex(pd.to_datetime(rows['timestamp'], utc=True)),
+        ).sort_index()
+        watermark = rows['updated_at'].max() if len(rows) else None
+
+        if entry is None or entry.frame.empty:
+            return _CachedSeries(rolling_stats(values, window), watermark)
+
+        frame = entry.frame
+        watermark = max(entry.watermark, watermark) if entry.watermark else watermark
+
+        if values.empty:
+            return entry
+        if values.index.min() > frame.index.max():
+            # New rows only extend the series: recompute the trailing windows
+            combined = pd.concat([frame['value'], values])
+            tail = combined.iloc[-(window + 1 + len(values)):]
+            updated = rolling_stats(tail, window).iloc[-len(values):]
+            return _CachedSeries(pd.concat([frame, updated]), watermark)
+
+        # Corrections or backfill inside the series invalidate later windows
+        combined = values.combine_first(frame['value']).sort_index()
+        return _CachedSeries(rolling_stats(combined, window), watermark)
+
+    def _correlation(self, entries, window, start_date, end_date):
+        key = (CORRELATION_PAIR, window, start_date, end_date)
+        version = tuple(entries[name].version for name in CORRELATION_PAIR)
+        cached = self._correlations.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        returns = pd.concat(
+            {name: self._daily_returns(entries[name].frame['value']) for name in CORRELATION_PAIR},
+            axis=1,
+        ).dropna()
+        first, second = CORRELATION_PAIR
+        correlation = returns[first].rolling(window).corr(returns[second])
+        self._remember(self._correlations, key, (version, correlation))
+        return correlation
+
+    def _daily_returns(self, values):
+        """Returns between the last values of consecutive US/Eastern dates"""
+        values = values.copy()
+        values.index = values.index.tz_convert(EASTERN_TZ).normalize()
+        return values.groupby(level=0).last().pct_change(fill_method=None)
+
+    def _remember(self, cache, key, value):
+        cache.pop(key, None)
+        cache[key] = value
+        while len(cache) > MAX_CACHED_RESULTS:
+            cache.pop(next(iter(cache)))
+
+
+rolling_analytics = RollingAnalytics()
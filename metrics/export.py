@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.utils.dateparse import parse_date
+
+from .models import MarketMetrics
+from .timestamps import start_of_day
+
+EXPORT_FIELDS = ('timestamp', 'metric_name', 'metric_value', 'data_type', 'source')
+EXPORT_FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+ROWS_PER_CHUNK = 2000
+
+
+def export_rows(metric_names=None, start_date=None, end_date=None, chunk_size=ROWS_PER_CHUNK):
+    """Iterate export rows as tuples with a server-side cursor"""
+    queryset = MarketMetrics.objects.all()
+    if metric_names:
+        queryset = queryset.filter(metric_name__in=metric_names)
+    if start_date:
+        queryset = queryset.filter(timestamp__gte=start_of_day(start_date))
+    if end_date:
+        queryset = queryset.filter(timestamp__lt=start_of_day(end_date))
+
+    return queryset.order_by('metric_name', 'timestamp').values_list(*EXPORT_FIELDS).iterator(
+        chunk_size=chunk_size
+    )
+
+
+def parse_date_bound(value, name):
+    """Parse an optional ``YYYY-MM-DD`` range bound, raising ValueError naming ``name``"""
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError(f"'{name}' must be a valid YYYY-MM-DD date")
+    return parsed
+
+
+def iter_export(rows, export_format='csv', compress=False):
+    """Encode rows as CSV or NDJSON byte chunks, optionally gzipped"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{export_format}'")
+
+    encode = _iter_csv if export_format == 'csv' else _iter_ndjson
+    chunks = (chunk.encode('utf-8') for chunk in encode(rows))
+    return _iter_gzip(chunks) if compress else chunks
+
+
+async def aiter_chunks(chunks):
+    """Serve a synchronous chunk iterator to ASGI one chunk at a time.
+
+    Each chunk is produced on Django's sync thread, so the database cursor
+    stays on its connection and only one chunk is held in memory.
+    """
+    chunks = iter(chunks)
+    while True:
+        chunk = await sync_to_async(next, thread_sensitive=True)(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _iter_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for batch in _batched(rows):
+        writer.writerows(
+            (timestamp.isoformat(), metric_name, _number(value), data_type, source)
+            for timestamp, metric_name, value, data_type, source in batch
+        )
+        yield _drain(buffer)
+    yield _drain(buffer)
+
+
+def _iter_ndjson(rows):
+    for batch in _batched(rows):
+        yield "".join(
+            json.dumps({
+                "timestamp": timestamp.isoformat(),
+                "metric_name": metric_name,
+                "metric_value": _number(value),
+                "data_type": data_type,
+                "source": source,
+            }) + "\n"
+            for timestamp, metric_name, value, data_type, source in batch
+        )
+
+
+def _number(value):
+    # Both formats write the float, not the stored Decimal's fixed decimals
+    return float(value) if value is not None else None
+
+
+def _iter_gzip(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _batched(rows, size=ROWS_PER_CHUNK):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _drain(buffer):
+    content = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return content
+
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+
+from django.db.models import Count, Max
+
+from .models import MarketMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class LatestValuesCache:
+    """In-process map of metric name -> latest (timestamp, value, source).
+
+    Writes from other processes (the collection command, imports, other
+    workers) are picked up on read: at most every ``refresh_interval``
+    seconds one grouped query fetches each metric's row count and last
+    write, and only metrics whose pair changed are reloaded. The row count
+    catches deletions (e.g. compaction), which leave no updated_at trace.
+    """
+    refresh_interval = 2.0
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._warmed = False
+        self._versions = {}
+        self._checked_at = 0.0
+
+    def warm(self):
+        """Load the latest row of every metric, one index seek per metric"""
+        with self._refresh_lock:
+            # Read the versions first so writes during the load are seen next refresh
+            versions = self._current_versions()
+            self._load(versions, replace=True)
+            self._versions = versions
+            self._checked_at = time.monotonic()
+            self._warmed = True
+        logger.info(f"Warmed latest values cache with {len(self._entries)} metrics")
+
+    def ensure_warm(self):
+        if not self._warmed:
+            self.warm()
+
+    def refresh(self):
+        """Reload metrics written or deleted since the last check, if the check is due"""
+        if time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+        with self._refresh_lock:
+            if time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            self._checked_at = time.monotonic()
+
+            versions = self._current_versions()
+            if versions == self._versions:
+                return
+            changed = [name for name, version in versions.items() if self._versions.get(name) != version]
+            removed = set(self._versions) - set(versions)
+            self._load(changed, removed=removed)
+            self._versions = versions
+
+    def record(self, metric_name, timestamp, value, source):
+        """Update a metric in place if the write is at least as new as the cached value"""
+        entry = self._entry(timestamp, value, source)
+        with self._lock:
+            current = self._entries.get(metric_name)
+            if current is None or entry["timestamp"] >= current["timestamp"]:
+                self._entries[metric_name] = entry
+
+    def get(self, metric_names=None):
+        self.ensure_warm()
+        self.refresh()
+        with self._lock:
+            if not metric_names:
+                return dict(self._entries)
+            return {name: self._entries[name] for name in metric_names if name in self._entries}
+
+    def _load(self, metric_names, replace=False, removed=()):
+        entries = {}
+        for metric_name in metric_names:
+            latest = MarketMetrics.objects.filter(
+                metric_name=metric_name
+            ).order_by('-timestamp').values_list('timestamp', 'metric_value', 'source').first()
+            if latest is not None:
+                timestamp, value, source = latest
+                entries[metric_name] = self._entry(timestamp, value, source)
+
+        with self._lock:
+            if replace:
+                self._entries = entries
+            else:
+                for metric_name in removed:
+                    self._entries.pop(metric_name, None)
+                self._entries.update(entries)
+
+    def _current_versions(self):
+        """Map of metric name -> (row count, last updated_at)"""
+        return {
+            metric_name: (rows, last_write)
+            for metric_name, rows, last_write in MarketMetrics.objects.values('metric_name').annotate(
+                rows=Count('id'), last_write=Max('updated_at')
+            ).values_list('metric_name', 'rows', 'last_write')
+        }
+
+    def _entry(self, timestamp, value, source):
+        return {
+            "timestamp": timestamp,
+            "value": float(value) if value is not None else None,
+            "source": source,
+        }
+
+
+latest_values = LatestValuesCache()
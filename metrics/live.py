@@ -0,0 +1,134 @@
+import asyncio
+import contextvars
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import MarketMetrics
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = ('pk', 'metric_name', 'timestamp', 'metric_value', 'source', 'updated_at')
+
+
+def metric_event(metric_name, timestamp, metric_value, source, updated_at):
+    """Live feed payload for a stored row; ``updated_at`` doubles as the event id"""
+    return {
+        "metric_name": metric_name,
+        "timestamp": timestamp.isoformat(),
+        "value": float(metric_value) if metric_value is not None else None,
+        "source": source,
+        "updated_at": updated_at.isoformat(),
+    }
+
+
+class MetricBroadcaster:
+    """Fans out newly written metrics to live feed subscribers.
+
+    While anyone is subscribed, one task polls the (metric_name, updated_at)
+    index, so writes from any process -- the collection command, imports or
+    other workers -- reach the feed. Each poll re-reads a short overlap window
+    to pick up rows whose transactions committed late.
+
+    The task runs in its own context rather than the first subscriber's
+    request, and treats each poll like a request for connection handling,
+    so a dropped database connection is replaced on the next poll.
+    """
+    queue_size = 1000
+    poll_interval = 1.0
+    poll_overlap = timedelta(seconds=5)
+
+    def __init__(self):
+        self._subscribers = set()
+        self._task = None
+
+    def subscribe(self, metric_names=None):
+        """Register a subscriber on the running event loop and return its handle"""
+        subscription = _Subscription(
+            queue=asyncio.Queue(maxsize=self.queue_size),
+            metric_names=frozenset(metric_names or ()),
+        )
+        self._subscribers.add(subscription)
+        if self._task is None or self._task.done():
+            loop = asyncio.get_running_loop()
+            self._task = contextvars.Context().run(loop.create_task, self._poll())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def dispatch(self, event):
+        for subscription in list(self._subscribers):
+            if subscription.wants(event["metric_name"]):
+                subscription.offer(event)
+
+    async def _poll(self):
+        watermark = sent = None
+        while True:
+            try:
+                if watermark is None:
+                    watermark, sent = await sync_to_async(_as_request(self._initial_state))()
+                else:
+                    rows = await sync_to_async(_as_request(self._rows_since))(watermark - self.poll_overlap)
+                    watermark, sent = self._dispatch_rows(rows, watermark, sent)
+            except Exception as e:
+                logger.error(f"Live feed poll failed: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    def _dispatch_rows(self, rows, watermark, sent):
+        for pk, metric_name, timestamp, value, source, updated_at in rows:
+            if sent.get(pk) == updated_at:
+                continue
+            sent[pk] = updated_at
+            watermark = max(watermark, updated_at)
+            self.dispatch(metric_event(metric_name, timestamp, value, source, updated_at))
+
+        horizon = watermark - self.poll_overlap
+        return watermark, {pk: updated_at for pk, updated_at in sent.items() if updated_at >= horizon}
+
+    def _initial_state(self):
+        # Rows already inside the overlap window predate every subscriber
+        watermark = MarketMetrics.objects.aggregate(Max('updated_at'))['updated_at__max'] or timezone.now()
+        sent = {row[0]: row[-1] for row in self._rows_since(watermark - self.poll_overlap)}
+        return watermark, sent
+
+    def _rows_since(self, since):
+        return list(
+            MarketMetrics.objects.filter(updated_at__gt=since).order_by('updated_at').values_list(*EVENT_FIELDS)
+        )
+
+
+def _as_request(func):
+    """Wrap a poll query in the connection cleanup Django runs around requests"""
+    def wrapper(*args):
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+class _Subscription:
+    def __init__(self, queue, metric_names):
+        self.queue = queue
+        self.metric_names = metric_names
+
+    def wants(self, metric_name):
+        return not self.metric_names or metric_name in self.metric_names
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning(f"Live feed subscriber is lagging, dropping {event['metric_name']} event")
+
+
+broadcaster = MetricBroadcaster()
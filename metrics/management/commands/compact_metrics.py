@@ -0,0 +1,219 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from metrics.models import MarketMetrics
+import logging
+import pandas as pd
+import statistics
+import time
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES = ('last', 'mean', 'min', 'max')
+
+class Command(BaseCommand):
+    help = 'Applies per-metric retention policies: downsamples old rows, deletes expired rows in chunks, then vacuums and analyzes the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--metric', action='append', dest='metrics', help='Only compact this configured metric (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows deleted per statement')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+        parser.add_argument('--skip-vacuum', action='store_true', help='Do not VACUUM/ANALYZE afterwards')
+
+    def handle(self, *args, **options):
+        policies = getattr(settings, 'METRIC_RETENTION_POLICIES', {})
+        metric_names = [name for name in options['metrics'] or sorted(policies) if name in policies]
+        if not metric_names:
+            self.stdout.write('No retention policies configured for these metrics; nothing to do')
+            return
+        for metric_name in metric_names:
+            self.validate_policy(metric_name, policies[metric_name])
+        now = timezone.now()
+
+        size_before = self.database_size()
+        latency_before = self.measure_query_latency(metric_names)
+
+        total_deleted = total_downsampled = total_aggregates = 0
+        for metric_name in metric_names:
+            policy = policies[metric_name]
+
+            if policy.get('delete_after_days') is not None:
+                cutoff = now - timedelta(days=policy['delete_after_days'])
+                deleted = self.delete_expired(metric_name, cutoff, options['chunk_size'], options['dry_run'])
+                total_deleted += deleted
+                self.stdout.write(f'{metric_name}: {deleted} rows older than {cutoff.date()} deleted')
+
+            if policy.get('downsample_after_days') is not None:
+                cutoff = now - timedelta(days=policy['downsample_after_days'])
+                downsampled, aggregates = self.downsample(
+                    metric_name, cutoff, policy, options['chunk_size'], options['dry_run']
+                )
+                total_downsampled += downsampled
+                total_aggregates += aggregates
+                self.stdout.write(
+                    f'{metric_name}: {downsampled} rows before {cutoff.date()} '
+                    f'rolled up into {aggregates} {policy["downsample_to"]} rows'
+                )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('\nDry run: no rows were changed'))
+            return
+
+        if not options['skip_vacuum']:
+            self.vacuum()
+
+        size_after = self.database_size()
+        latency_after = self.measure_query_latency(metric_names)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nCompaction completed: {total_deleted} rows deleted, '
+                f'{total_downsampled} rows downsampled into {total_aggregates}'
+            )
+        )
+        if size_before is not None and size_after is not None:
+            self.stdout.write(
+                f'Database size: {size_before} -> {size_after} bytes '
+                f'({size_before - size_after} bytes reclaimed)'
+            )
+        self.stdout.write(f'Query latency: {latency_before:.2f} ms -> {latency_after:.2f} ms')
+        logger.info(
+            f'Compacted metrics: deleted {total_deleted}, downsampled {total_downsampled} '
+            f'into {total_aggregates}, size {size_before} -> {size_after} bytes'
+        )
+
+    def validate_policy(self, metric_name, policy):
+        aggregate = policy.get('aggregate', 'last')
+        if aggregate not in AGGREGATES:
+            raise CommandError(f"Unknown aggregate '{aggregate}' in retention policy for {metric_name}")
+        if policy.get('downsample_after_days') is not None:
+            try:
+                pd.Timedelta(policy['downsample_to'])
+            except (KeyError, ValueError):
+                raise CommandError(
+                    f"Retention policy for {metric_name} needs a fixed 'downsample_to' frequency such as '1D'"
+                )
+
+    def delete_expired(self, metric_name, cutoff, chunk_size, dry_run):
+        expired = MarketMetrics.objects.filter(metric_name=metric_name, timestamp__lt=cutoff)
+        if dry_run:
+            return expired.count()
+
+        deleted = 0
+        while True:
+            # Short statements keep the write lock brief between chunks
+            pks = list(expired.values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                return deleted
+            deleted += MarketMetrics.objects.filter(pk__in=pks).delete()[0]
+
+    def downsample(self, metric_name, cutoff, policy, chunk_size, dry_run):
+        """Roll rows before the cutoff up into one row per bucket, one window at a time"""
+        frequency = pd.Timedelta(policy['downsample_to'])
+        aggregate = policy.get('aggregate', 'last')
+        data_type = f"downsampled_{policy['downsample_to']}"[:20]
+
+        candidates = MarketMetrics.objects.filter(metric_name=metric_name).exclude(data_type=data_type)
+        first = candidates.filter(timestamp__lt=cutoff).order_by('timestamp').values_list('timestamp', flat=True).first()
+        if first is None:
+            return 0, 0
+
+        # Only whole buckets are compacted, so later runs never split one
+        window_end = pd.Timestamp(cutoff).floor(frequency)
+        window_start = pd.Timestamp(first).floor(frequency)
+        window_span = frequency * max(1, int(pd.Timedelta(days=31) / frequency))
+
+        downsampled = aggregates = 0
+        while window_start < window_end:
+            window_stop = min(window_start + window_span, window_end)
+            rows = pd.DataFrame.from_records(
+                list(candidates.filter(
+                    timestamp__gte=window_start.to_pydatetime(),
+                    timestamp__lt=window_stop.to_pydatetime()
+                ).order_by('timestamp').values_list('pk', 'timestamp', 'metric_value', 'source')),
+                columns=['pk', 'timestamp', 'metric_value', 'source'],
+            )
+            window_start = window_stop
+            if rows.empty:
+                continue
+
+            rows['timestamp'] = pd.to_datetime(rows['timestamp'], utc=True)
+            rows['metric_value'] = pd.to_numeric(rows['metric_value'], errors='coerce')
+            buckets = rows.groupby(rows['timestamp'].dt.floor(frequency))
+            rows = rows[buckets['pk'].transform('size') > 1]
+            if rows.empty:
+                continue
+
+            buckets = rows.groupby(rows['timestamp'].dt.floor(frequency))
+            rolled_up = buckets.agg(
+                timestamp=('timestamp', 'last'),
+                metric_value=('metric_value', aggregate),
+                source=('source', 'last'),
+            )
+            downsampled += len(rows)
+            aggregates += len(rolled_up)
+            if dry_run:
+                continue
+
+            pks = rows['pk'].tolist()
+            with transaction.atomic():
+                for start in range(0, len(pks), chunk_size):
+                    MarketMetrics.objects.filter(pk__in=pks[start:start + chunk_size]).delete()
+                MarketMetrics.objects.bulk_create([
+                    MarketMetrics(
+                        timestamp=row.timestamp.to_pydatetime(),
+                        metric_name=metric_name,
+                        metric_value=None if pd.isna(row.metric_value) else float(row.metric_value),
+                        data_type=data_type,
+                        source=row.source,
+                    )
+                    for row in rolled_up.itertuples(index=False)
+                ], batch_size=chunk_size)
+
+        return downsampled, aggregates
+
+    def vacuum(self):
+        self.stdout.write('Vacuuming and analyzing database...')
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('PRAGMA auto_vacuum')
+                if cursor.fetchone()[0] == 2:
+                    cursor.execute('PRAGMA incremental_vacuum')
+                else:
+                    cursor.execute('VACUUM')
+                cursor.execute('ANALYZE')
+            elif connection.vendor == 'postgresql':
+                cursor.execute(f'VACUUM ANALYZE {MarketMetrics._meta.db_table}')
+            else:
+                cursor.execute(f'ANALYZE TABLE {MarketMetrics._meta.db_table}')
+
+    def database_size(self):
+        """Bytes on disk for the SQLite file, or the metrics table on PostgreSQL"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('PRAGMA page_count')
+                page_count = cursor.fetchone()[0]
+                cursor.execute('PRAGMA page_size')
+                return page_count * cursor.fetchone()[0]
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s)', [MarketMetrics._meta.db_table])
+                return cursor.fetchone()[0]
+        return None
+
+    def measure_query_latency(self, metric_names, repeats=5):
+        """Median milliseconds for a latest-value lookup and a 30-day range scan per metric"""
+        since = timezone.now() - timedelta(days=30)
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for metric_name in metric_names:
+                MarketMetrics.objects.filter(metric_name=metric_name).order_by('-timestamp').values_list(
+                    'metric_value', flat=True
+                ).first()
+                list(MarketMetrics.objects.filter(
+                    metric_name=metric_name, timestamp__gte=since
+                ).values_list('timestamp', 'metric_value'))
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from metrics.export import EXPORT_FORMATS, ROWS_PER_CHUNK, export_rows, iter_export, parse_date_bound
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Streams stored market metrics to a CSV or NDJSON file (optionally gzipped) using constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--names', default='', help='Comma separated metric names (default: all metrics)')
+        parser.add_argument('--start', help='First date to export, YYYY-MM-DD')
+        parser.add_argument('--end', help='Date to stop before, YYYY-MM-DD')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=ROWS_PER_CHUNK, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        metric_names = [name for name in options['names'].split(',') if name]
+        start_date = self.parse_date_option(options, 'start')
+        end_date = self.parse_date_option(options, 'end')
+
+        rows = export_rows(metric_names, start_date, end_date, chunk_size=options['chunk_size'])
+        chunks = iter_export(rows, options['format'], options['gzip'])
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        bytes_written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                bytes_written += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
+
+        if options['output']:
+            self.stdout.write(
+                self.style.SUCCESS(f'Exported {bytes_written} bytes to {options["output"]}')
+            )
+            logger.info(f'Exported {bytes_written} bytes to {options["output"]}')
+
+    def parse_date_option(self, options, name):
+        try:
+            return parse_date_bound(options[name], f'--{name}')
+        except ValueError as e:
+            raise CommandError(str(e))
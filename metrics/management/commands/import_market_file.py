@@ -0,0 +1,79 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from metrics.parsing import parse_chunk
+from metrics.validation import ingest_frame
+import logging
+import os
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Imports a vendor CSV file of market metrics, parsing chunks across a process pool and bulk-upserting them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import (may be compressed)')
+        parser.add_argument('--chunk-size', type=int, default=100_000, help='Rows per parsed chunk')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Parser processes')
+        parser.add_argument('--timestamp-column', default='timestamp')
+        parser.add_argument('--name-column', default='metric_name')
+        parser.add_argument('--value-column', default='metric_value')
+        parser.add_argument('--source-column', default='source')
+        parser.add_argument('--metric-name', help='Use this metric name for every row instead of a name column')
+        parser.add_argument('--source', help='Source for rows without a source column (default: file name)')
+        parser.add_argument('--data-type', default='eod')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+
+        columns = {
+            "timestamp": options['timestamp_column'],
+            "metric_name": options['name_column'],
+            "metric_value": options['value_column'],
+            "source": options['source_column'],
+        }
+        source = options['source'] or f'Vendor file ({os.path.basename(path)})'
+        workers = max(1, options['workers'] or 1)
+
+        reader = pd.read_csv(
+            path,
+            chunksize=options['chunk_size'],
+            dtype=str,
+            keep_default_na=False,
+            na_values=['', '.', 'NA', 'N/A', 'NaN', 'null'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Importing {path} with {workers} workers...'))
+        imported = rejected = 0
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Bound the chunks in flight so memory does not grow with file size
+            pending = deque()
+            for chunk in reader:
+                missing = {columns["timestamp"], columns["metric_value"]} - set(chunk.columns)
+                if options['metric_name'] is None:
+                    missing |= {columns["metric_name"]} - set(chunk.columns)
+                if missing:
+                    raise CommandError(f'Missing columns in {path}: {", ".join(sorted(missing))}')
+
+                pending.append(executor.submit(parse_chunk, chunk, columns, options['metric_name'], source))
+                if len(pending) >= workers * 2:
+                    imported, rejected = self.write_chunk(pending.popleft(), options, imported, rejected)
+
+            while pending:
+                imported, rejected = self.write_chunk(pending.popleft(), options, imported, rejected)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\nImport completed: {imported} rows upserted, {rejected} rows quarantined')
+        )
+        logger.info(f'Imported {imported} rows from {path}, quarantined {rejected}')
+
+    def write_chunk(self, future, options, imported, rejected):
+        valid, chunk_rejected = ingest_frame(future.result(), options['data_type'])
+        imported += len(valid)
+        rejected += len(chunk_rejected)
+        self.stdout.write(f'{imported} rows upserted, {rejected} quarantined so far')
+        return imported, rejected
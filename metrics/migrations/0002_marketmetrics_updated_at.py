@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marketmetrics',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='marketmetrics',
+            index=models.Index(fields=['metric_name', 'updated_at'], name='idx_metric_updated'),
+        ),
+    ]
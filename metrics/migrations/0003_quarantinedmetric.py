@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrics', '0002_marketmetrics_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuarantinedMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(null=True)),
+                ('metric_name', models.CharField(max_length=50)),
+                ('raw_value', models.CharField(blank=True, max_length=64, null=True)),
+                ('source', models.CharField(blank=True, max_length=50, null=True)),
+                ('reason', models.CharField(choices=[('bad_timestamp', 'Missing or unparseable timestamp'), ('missing', 'Missing value or metric name'), ('non_numeric', 'Non-numeric or non-finite value'), ('out_of_range', 'Outside the allowed range'), ('jump', 'Jump beyond the allowed sigma versus history')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['metric_name', '-created_at'], name='idx_quarantine_metric')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrics', '0003_quarantinedmetric'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marketmetrics',
+            index=models.Index(fields=['updated_at'], name='idx_updated_at'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:15
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_quarantine_rows(apps, schema_editor):
+    QuarantinedMetric = apps.get_model('metrics', 'QuarantinedMetric')
+    timed = QuarantinedMetric.objects.filter(timestamp__isnull=False)
+    untimed = QuarantinedMetric.objects.filter(timestamp__isnull=True, raw_value__isnull=False)
+    for rows, key in ((timed, 'timestamp'), (untimed, 'raw_value')):
+        keep = rows.values(key, 'metric_name', 'reason').annotate(first=Min('id')).values_list('first', flat=True)
+        rows.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrics', '0004_marketmetrics_idx_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_quarantine_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='quarantinedmetric',
+            constraint=models.UniqueConstraint(fields=('timestamp', 'metric_name', 'reason'), name='uniq_quarantine_row'),
+        ),
+        migrations.AddConstraint(
+            model_name='quarantinedmetric',
+            constraint=models.UniqueConstraint(condition=models.Q(('timestamp__isnull', True)), fields=('metric_name', 'raw_value', 'reason'), name='uniq_quarantine_untimed_row'),
+        ),
+    ]
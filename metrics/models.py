@@ -7,16 +7,54 @@ class MarketMetrics(models.Model):
     data_type = models.CharField(max_length=20, default='premarket')
     source = models.CharField(max_length=50, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('timestamp', 'metric_name')
         indexes = [
             models.Index(fields=['metric_name', '-timestamp']),
+            models.Index(fields=['metric_name', 'updated_at'], name='idx_metric_updated'),
+            models.Index(fields=['updated_at'], name='idx_updated_at'),
         ]
 
     def __str__(self):
         return f"{self.metric_name} - {self.timestamp}"
 
+class QuarantinedMetric(models.Model):
+    REASON_CHOICES = [
+        ('bad_timestamp', 'Missing or unparseable timestamp'),
+        ('missing', 'Missing value or metric name'),
+        ('non_numeric', 'Non-numeric or non-finite value'),
+        ('out_of_range', 'Outside the allowed range'),
+        ('jump', 'Jump beyond the allowed sigma versus history'),
+    ]
+
+    timestamp = models.DateTimeField(null=True)
+    metric_name = models.CharField(max_length=50)
+    raw_value = models.CharField(max_length=64, null=True, blank=True)
+    source = models.CharField(max_length=50, null=True, blank=True)
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['metric_name', '-created_at'], name='idx_quarantine_metric'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['timestamp', 'metric_name', 'reason'], name='uniq_quarantine_row'
+            ),
+            # NULL timestamps never conflict above, so key those rows on the raw value
+            models.UniqueConstraint(
+                fields=['metric_name', 'raw_value', 'reason'],
+                condition=models.Q(timestamp__isnull=True),
+                name='uniq_quarantine_untimed_row',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.metric_name} - {self.timestamp} ({self.reason})"
+
 class DailySnapshots(models.Model):
     date = models.DateField(primary_key=True)
     snapshot_time = models.DateTimeField()
@@ -0,0 +1,23 @@
+"""Chunk parsing for process-pool workers.
+
+Deliberately free of Django imports so that workers started with ``spawn``
+or ``forkserver`` can unpickle these functions without an app registry.
+"""
+import pandas as pd
+
+from .screening import screen_frame
+from .timestamps import to_eastern
+
+
+def parse_chunk(chunk, columns, metric_name, source):
+    """Normalise and screen one CSV chunk in a worker process.
+
+    Timestamps are converted to US/Eastern and the history-free checks run
+    here; the parent only adds the jump check and writes.
+    """
+    return screen_frame(pd.DataFrame({
+        "timestamp": to_eastern(chunk[columns["timestamp"]]),
+        "metric_name": chunk[columns["metric_name"]] if metric_name is None else metric_name,
+        "metric_value": chunk[columns["metric_value"]],
+        "source": chunk[columns["source"]] if columns["source"] in chunk else source,
+    }))
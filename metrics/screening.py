@@ -0,0 +1,46 @@
+"""Row checks that need no stored history.
+
+Free of Django imports so import workers can screen chunks in parallel;
+metrics.validation adds the history-based jump check before writing.
+"""
+import numpy as np
+import pandas as pd
+
+# Inclusive (lower, upper) bounds; metrics not listed are unbounded
+VALUE_BOUNDS = {
+    'nq_close': (0, 1_000_000),
+    'vix_level': (0, 200),
+    'treasury_10y_yield': (-5, 30),
+    'overnight_gap_percent': (-50, 50),
+    'put_call_ratio': (0, 10),
+}
+LOWER_BOUNDS = {name: bounds[0] for name, bounds in VALUE_BOUNDS.items()}
+UPPER_BOUNDS = {name: bounds[1] for name, bounds in VALUE_BOUNDS.items()}
+MISSING_MARKERS = ('', '.')
+
+
+def screen_frame(frame):
+    """Add a float ``value`` column and a ``reason`` column ('' when the row passes).
+
+    ``frame`` has timestamp, metric_name, metric_value and source columns;
+    the raw metric_value is kept for quarantine.
+    """
+    frame = frame.reset_index(drop=True)
+    raw = frame['metric_value']
+    values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=float)
+
+    bad_timestamp = frame['timestamp'].isna().to_numpy()
+    missing = (raw.isna() | raw.isin(MISSING_MARKERS) | frame['metric_name'].isna()).to_numpy()
+    non_numeric = ~missing & ~np.isfinite(values)
+
+    lower = frame['metric_name'].map(LOWER_BOUNDS).fillna(-np.inf).to_numpy(dtype=float)
+    upper = frame['metric_name'].map(UPPER_BOUNDS).fillna(np.inf).to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        out_of_range = (values < lower) | (values > upper)
+
+    reasons = np.select(
+        [bad_timestamp, missing, non_numeric, out_of_range],
+        ['bad_timestamp', 'missing', 'non_numeric', 'out_of_range'],
+        default='',
+    )
+    return frame.assign(value=values, reason=reasons)
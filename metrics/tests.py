@@ -1,3 +1,482 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import date, timedelta
 
-# Create your tests here.
+import pandas as pd
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .analytics import RollingAnalytics, rolling_stats
+from .export import export_rows, iter_export
+from .latest import LatestValuesCache
+from .live import MetricBroadcaster
+from .models import MarketMetrics, QuarantinedMetric
+from .validation import ingest_frame, validate_frame
+
+START = pd.Timestamp('2024-01-01', tz='UTC')
+
+
+def metric_frame(rows):
+    """Raw frame from (timestamp, metric_name, metric_value) tuples"""
+    timestamps, metric_names, metric_values = zip(*rows)
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(list(timestamps), utc=True),
+        'metric_name': list(metric_names),
+        'metric_value': pd.Series(metric_values, dtype=object),
+        'source': 'test',
+    })
+
+
+class ValidateFrameTests(TestCase):
+    def test_reason_codes(self):
+        frame = metric_frame([
+            (START, 'vix_level', '15.2'),
+            (None, 'vix_level', '15.3'),
+            (START, 'treasury_10y_yield', '.'),
+            (START, 'put_call_ratio', 'n/a'),
+            (START, 'overnight_gap_percent', 'inf'),
+            (START, 'vix_level', '500'),
+        ])
+
+        valid, rejected = validate_frame(frame)
+
+        self.assertEqual(valid['metric_value'].tolist(), [15.2])
+        self.assertEqual(
+            rejected['reason'].tolist(),
+            ['bad_timestamp', 'missing', 'non_numeric', 'non_numeric', 'out_of_range'],
+        )
+        self.assertEqual(rejected['metric_value'].tolist(), ['15.3', '.', 'n/a', 'inf', '500'])
+
+    def test_jump_follows_stored_trend(self):
+        # Steps alternate 10.5 and 9.5: mean step 10, sigma 0.5
+        value = 1000.0
+        for day in range(20):
+            MarketMetrics.objects.create(
+                timestamp=START + timedelta(days=day), metric_name='nq_close', metric_value=value
+            )
+            value += 10.5 if day % 2 == 0 else 9.5
+        last = value - 9.5
+
+        frame = metric_frame([
+            (START + timedelta(days=20), 'nq_close', last + 10),
+            (START + timedelta(days=21), 'nq_close', last + 40),
+        ])
+        valid, rejected = validate_frame(frame)
+
+        self.assertEqual(valid['metric_value'].tolist(), [last + 10])
+        self.assertEqual(rejected['reason'].tolist(), ['jump'])
+
+    def test_ingest_does_not_quarantine_twice(self):
+        frame = metric_frame([(START, 'treasury_10y_yield', '.'), (None, 'vix_level', 'x')])
+
+        with self.assertLogs('metrics.validation', level='WARNING') as logs:
+            ingest_frame(frame)
+        with self.assertNoLogs('metrics.validation', level='WARNING'):
+            ingest_frame(frame)
+
+        self.assertEqual(QuarantinedMetric.objects.count(), 2)
+        self.assertEqual(logs.output, ['WARNING:metrics.validation:Quarantined 2 metric rows (bad_timestamp=1, missing=1)'])
+
+
+class LiveMetricsFeedViewTests(TestCase):
+    def test_requires_asgi(self):
+        response = self.client.get(reverse('metrics:live_feed'))
+
+        self.assertEqual(response.status_code, 501)
+
+    async def read_events(self, response, count):
+        events = []
+        async for chunk in response.streaming_content:
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if not chunk.startswith(':'):
+                events.append(chunk)
+            if len(events) == count:
+                break
+        await response.streaming_content.aclose()
+        return events
+
+    async def test_catch_up_replays_rows_written_after_last_event_id(self):
+        older = await MarketMetrics.objects.acreate(timestamp=START, metric_name='vix_level', metric_value=14)
+        newer = await MarketMetrics.objects.acreate(
+            timestamp=START + timedelta(days=1), metric_name='vix_level', metric_value=15
+        )
+
+        response = await self.async_client.get(
+            reverse('metrics:live_feed'), headers={'Last-Event-ID': older.updated_at.isoformat()}
+        )
+        events = await self.read_events(response, 1)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(events[0].startswith(f"id: {newer.updated_at.isoformat()}\n"))
+
+    async def test_catch_up_is_capped(self):
+        row = await MarketMetrics.objects.acreate(timestamp=START, metric_name='vix_level', metric_value=14)
+        await MarketMetrics.objects.filter(pk=row.pk).aupdate(updated_at=timezone.now() - timedelta(days=2))
+        recent = await MarketMetrics.objects.acreate(
+            timestamp=START + timedelta(days=1), metric_name='vix_level', metric_value=15
+        )
+
+        response = await self.async_client.get(reverse('metrics:live_feed'), {'since': '2000-01-01T00:00:00'})
+        events = await self.read_events(response, 1)
+
+        self.assertIn(f"id: {recent.updated_at.isoformat()}\n", events[0])
+
+
+class MetricBroadcasterTests(SimpleTestCase):
+    async def test_poller_retries_a_failed_first_query(self):
+        broadcaster = MetricBroadcaster()
+        broadcaster.poll_interval = 0.01
+        attempts = []
+
+        def initial_state():
+            attempts.append(len(attempts))
+            if len(attempts) == 1:
+                raise DatabaseError("connection lost")
+            return timezone.now(), {}
+
+        broadcaster._initial_state = initial_state
+        broadcaster._rows_since = lambda since: []
+        subscription = broadcaster.subscribe()
+        try:
+            for _ in range(100):
+                if len(attempts) > 1:
+                    break
+                await asyncio.sleep(0.01)
+            self.assertGreater(len(attempts), 1)
+            self.assertFalse(broadcaster._task.done())
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+
+class LatestValuesCacheTests(TestCase):
+    def setUp(self):
+        self.cache = LatestValuesCache()
+        self.cache.refresh_interval = 0
+        for day, value in enumerate([14, 15, 16]):
+            MarketMetrics.objects.create(
+                timestamp=START + timedelta(days=day), metric_name='vix_level', metric_value=value
+            )
+        MarketMetrics.objects.create(timestamp=START, metric_name='nq_close', metric_value=17000)
+
+    def values(self):
+        return {name: entry['value'] for name, entry in self.cache.get().items()}
+
+    def test_warm_loads_the_latest_row_per_metric(self):
+        self.cache.warm()
+
+        self.assertEqual(self.values(), {'vix_level': 16.0, 'nq_close': 17000.0})
+
+    def test_record_keeps_the_newest_value(self):
+        self.cache.warm()
+        self.cache.refresh_interval = 60
+
+        self.cache.record('vix_level', START + timedelta(days=5), 18, 'test')
+        self.cache.record('vix_level', START + timedelta(days=4), 17, 'test')
+
+        self.assertEqual(self.values()['vix_level'], 18.0)
+
+    def test_refresh_picks_up_writes_from_elsewhere(self):
+        self.cache.warm()
+
+        MarketMetrics.objects.create(timestamp=START + timedelta(days=3), metric_name='vix_level', metric_value=17)
+
+        self.assertEqual(self.values()['vix_level'], 17.0)
+
+    def test_refresh_drops_deleted_rows(self):
+        self.cache.warm()
+
+        MarketMetrics.objects.filter(metric_name='vix_level', timestamp=START + timedelta(days=2)).delete()
+        MarketMetrics.objects.filter(metric_name='nq_close').delete()
+
+        self.assertEqual(self.values(), {'vix_level': 15.0})
+
+
+class ConditionalMetricsViewTests(TestCase):
+    def setUp(self):
+        MarketMetrics.objects.create(
+            timestamp=START + timedelta(days=1), metric_name='nq_close', metric_value=17000
+        )
+
+    def test_unchanged_data_returns_304(self):
+        url = reverse('metrics:get_nq_data')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_new_write_changes_the_etag(self):
+        url = reverse('metrics:get_nq_data')
+        etag = self.client.get(url)['ETag']
+
+        MarketMetrics.objects.create(
+            timestamp=START + timedelta(days=2), metric_name='nq_close', metric_value=17100
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_other_metrics_do_not_change_the_etag(self):
+        url = reverse('metrics:get_nq_data')
+        etag = self.client.get(url)['ETag']
+
+        MarketMetrics.objects.create(timestamp=START, metric_name='vix_level', metric_value=14)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        MarketMetrics.objects.create(timestamp=START, metric_name='vix_level', metric_value=14, source='CBOE')
+        MarketMetrics.objects.create(
+            timestamp=START + timedelta(days=1), metric_name='vix_level', metric_value=15.5, source='CBOE'
+        )
+        MarketMetrics.objects.create(timestamp=START, metric_name='nq_close', metric_value=17000)
+
+    def export(self, export_format, compress=False, **filters):
+        content = b''.join(iter_export(export_rows(**filters), export_format, compress))
+        return gzip.decompress(content) if compress else content
+
+    def test_csv_and_ndjson_agree(self):
+        csv_rows = list(csv.DictReader(io.StringIO(self.export('csv').decode())))
+        ndjson_rows = [json.loads(line) for line in self.export('ndjson').decode().splitlines()]
+
+        self.assertEqual(
+            [(row['metric_name'], float(row['metric_value']), row['source']) for row in csv_rows],
+            [('nq_close', 17000.0, ''), ('vix_level', 14.0, 'CBOE'), ('vix_level', 15.5, 'CBOE')],
+        )
+        self.assertEqual(
+            [(row['metric_name'], row['metric_value'], row['source']) for row in ndjson_rows],
+            [('nq_close', 17000.0, None), ('vix_level', 14.0, 'CBOE'), ('vix_level', 15.5, 'CBOE')],
+        )
+        self.assertEqual([row['metric_value'] for row in csv_rows], ['17000.0', '14.0', '15.5'])
+
+    def test_gzip_round_trip(self):
+        self.assertEqual(self.export('ndjson', compress=True), self.export('ndjson'))
+
+    def test_filters_by_name_and_date(self):
+        content = self.export(
+            'ndjson', metric_names=['vix_level'], start_date=date(2024, 1, 2), end_date=date(2024, 1, 3)
+        )
+
+        self.assertEqual([json.loads(line)['metric_value'] for line in content.decode().splitlines()], [15.5])
+
+    def test_export_metrics_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'metrics.csv.gz')
+            call_command(
+                'export_metrics', '--names', 'vix_level', '--gzip', '--output', path, stdout=io.StringIO()
+            )
+            with gzip.open(path, 'rt') as exported:
+                rows = list(csv.DictReader(exported))
+
+        self.assertEqual([row['metric_value'] for row in rows], ['14.0', '15.5'])
+
+    def test_export_metrics_rejects_bad_dates(self):
+        with self.assertRaisesMessage(CommandError, "'--start' must be a valid YYYY-MM-DD date"):
+            call_command('export_metrics', '--start', '2024-13-01', stdout=io.StringIO())
+
+    def test_export_view_rejects_bad_dates(self):
+        response = self.client.get(reverse('metrics:export'), {'start': '2024-01-32'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], "'start' must be a valid YYYY-MM-DD date")
+
+
+class ImportMarketFileTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_csv(self, content):
+        path = os.path.join(self.directory, 'vendor.csv')
+        with open(path, 'w') as vendor_file:
+            vendor_file.write(content)
+        return path
+
+    def import_file(self, path, *args):
+        call_command('import_market_file', path, '--workers', '1', '--chunk-size', '2', *args, stdout=io.StringIO())
+
+    def test_imports_valid_rows_and_quarantines_bad_ones(self):
+        path = self.write_csv(
+            "timestamp,metric_name,metric_value,source\n"
+            "2024-02-01,vix_level,14.1,vendor\n"
+            "2024-02-02,vix_level,.,vendor\n"
+            "2024-02-02T16:00:00-05:00,nq_close,17500.25,vendor\n"
+            "bad,nq_close,1,vendor\n"
+        )
+
+        self.import_file(path)
+
+        stored = MarketMetrics.objects.order_by('metric_name').values_list('metric_name', 'timestamp', 'metric_value')
+        self.assertEqual(
+            [(name, timestamp.isoformat(), float(value)) for name, timestamp, value in stored],
+            [('nq_close', '2024-02-02T21:00:00+00:00', 17500.25), ('vix_level', '2024-02-01T00:00:00+00:00', 14.1)],
+        )
+        self.assertEqual(
+            sorted(QuarantinedMetric.objects.values_list('metric_name', 'reason')),
+            [('nq_close', 'bad_timestamp'), ('vix_level', 'missing')],
+        )
+
+    def test_metric_name_option_replaces_the_name_column(self):
+        path = self.write_csv("date,close\n2024-02-01,14.1\n2024-02-02,14.3\n")
+
+        self.import_file(
+            path, '--metric-name', 'vix_level', '--timestamp-column', 'date', '--value-column', 'close'
+        )
+
+        self.assertEqual(
+            list(MarketMetrics.objects.order_by('timestamp').values_list('metric_name', 'source')),
+            [('vix_level', 'Vendor file (vendor.csv)')] * 2,
+        )
+
+    def test_missing_columns_are_an_error(self):
+        path = self.write_csv("timestamp,metric_name\n2024-02-01,vix_level\n")
+
+        with self.assertRaisesMessage(CommandError, 'Missing columns in'):
+            self.import_file(path)
+        self.assertFalse(MarketMetrics.objects.exists())
+
+
+class RollingAnalyticsRefreshTests(TestCase):
+    window = 3
+
+    def rows(self, values, start=0):
+        return pd.DataFrame({
+            'metric_name': 'nq_close',
+            'timestamp': [START + timedelta(days=start + day) for day in range(len(values))],
+            'value': values,
+            'updated_at': timezone.now(),
+        })
+
+    def expected(self, values):
+        series = pd.Series(values, index=pd.DatetimeIndex(
+            [START + timedelta(days=day) for day in range(len(values))]
+        ), dtype=float)
+        return rolling_stats(series, self.window)
+
+    def test_extend_matches_a_full_recompute(self):
+        analytics = RollingAnalytics()
+        entry = analytics._refresh(None, self.rows([100, 102, 101, 105, 104]), self.window)
+
+        entry = analytics._refresh(entry, self.rows([108, 107], start=5), self.window)
+
+        pd.testing.assert_frame_equal(
+            entry.frame, self.expected([100, 102, 101, 105, 104, 108, 107]),
+            check_freq=False, check_names=False,
+        )
+
+    def test_correction_recomputes_the_series(self):
+        analytics = RollingAnalytics()
+        entry = analytics._refresh(None, self.rows([100, 102, 101, 105, 104]), self.window)
+
+        entry = analytics._refresh(entry, self.rows([110], start=1), self.window)
+
+        pd.testing.assert_frame_equal(
+            entry.frame, self.expected([100, 110, 101, 105, 104]),
+            check_freq=False, check_names=False,
+        )
+
+    def test_deleted_rows_force_a_reload(self):
+        for day, value in enumerate([100, 102, 101, 105]):
+            MarketMetrics.objects.create(
+                timestamp=START + timedelta(days=day), metric_name='nq_close', metric_value=value
+            )
+        analytics = RollingAnalytics()
+        analytics.get(['nq_close'], self.window)
+
+        MarketMetrics.objects.filter(timestamp=START).delete()
+        frames, _ = analytics.get(['nq_close'], self.window)
+
+        self.assertEqual(frames['nq_close']['value'].tolist(), [102, 101, 105])
+
+
+class AnalyticsViewTests(TestCase):
+    def test_correlation_uses_one_value_per_date(self):
+        # Four intraday rows per Eastern date, one fewer VIX row on the last date
+        closes = {'nq_close': [100, 101, 102, 110, 50, 50, 50, 121, 50, 50, 50, 127.05],
+                  'vix_level': [30, 30, 30, 20, 10, 10, 10, 18, 10, 10, 17.1]}
+        for metric_name, values in closes.items():
+            for position, value in enumerate(values):
+                MarketMetrics.objects.create(
+                    timestamp=START + timedelta(days=position // 4, hours=14 + position % 4),
+                    metric_name=metric_name,
+                    metric_value=value,
+                )
+
+        response = self.client.get(reverse('metrics:analytics'), {'window': 2})
+
+        self.assertEqual(response.status_code, 200)
+        correlation = response.json()['correlation']['data']
+        self.assertEqual([point['date'] for point in correlation], ['2024-01-02', '2024-01-03'])
+        self.assertIsNone(correlation[0]['correlation'])
+        self.assertAlmostEqual(correlation[1]['correlation'], -1.0)
+
+
+@override_settings(METRIC_RETENTION_POLICIES={
+    'put_call_ratio': {'downsample_after_days': 30, 'downsample_to': '1D', 'aggregate': 'mean'},
+})
+class CompactMetricsTests(TestCase):
+    def setUp(self):
+        self.day = pd.Timestamp(timezone.now() - timedelta(days=60)).floor('1D')
+        for metric_name in ('put_call_ratio', 'vix_level'):
+            for hour, value in ((1, 0.8), (2, 1.0), (3, 1.2)):
+                MarketMetrics.objects.create(
+                    timestamp=(self.day + timedelta(hours=hour)).to_pydatetime(),
+                    metric_name=metric_name,
+                    metric_value=value,
+                    source='test',
+                )
+        MarketMetrics.objects.create(
+            timestamp=timezone.now(), metric_name='put_call_ratio', metric_value=0.9
+        )
+
+    def compact(self, *args):
+        call_command('compact_metrics', '--skip-vacuum', *args, stdout=io.StringIO())
+
+    def test_rolls_old_rows_into_one_row_per_bucket(self):
+        self.compact()
+
+        rolled_up = MarketMetrics.objects.get(metric_name='put_call_ratio', data_type='downsampled_1D')
+        self.assertEqual(rolled_up.timestamp, (self.day + timedelta(hours=3)).to_pydatetime())
+        self.assertAlmostEqual(float(rolled_up.metric_value), 1.0)
+        self.assertEqual(rolled_up.source, 'test')
+        self.assertEqual(MarketMetrics.objects.filter(metric_name='put_call_ratio').count(), 2)
+
+    def test_metrics_without_a_policy_are_untouched(self):
+        self.compact('--metric', 'vix_level')
+
+        self.assertEqual(MarketMetrics.objects.filter(metric_name='vix_level').count(), 3)
+        self.assertEqual(MarketMetrics.objects.filter(metric_name='put_call_ratio').count(), 4)
+
+    def test_dry_run_changes_nothing(self):
+        self.compact('--dry-run')
+
+        self.assertEqual(MarketMetrics.objects.count(), 7)
+
+    @override_settings(METRIC_RETENTION_POLICIES={})
+    def test_nothing_is_compacted_without_policies(self):
+        self.compact()
+
+        self.assertEqual(MarketMetrics.objects.count(), 7)
+
+    @override_settings(METRIC_RETENTION_POLICIES={'vix_level': {'delete_after_days': 30}})
+    def test_deletes_expired_rows(self):
+        self.compact('--chunk-size', '2')
+
+        self.assertFalse(MarketMetrics.objects.filter(metric_name='vix_level').exists())
+        self.assertEqual(MarketMetrics.objects.filter(metric_name='put_call_ratio').count(), 4)
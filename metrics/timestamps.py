@@ -0,0 +1,21 @@
+from datetime import datetime, time, timezone
+
+import pandas as pd
+from pytz import timezone as pytz_timezone
+
+EASTERN_TZ = pytz_timezone('US/Eastern')
+
+
+def to_eastern(values):
+    """Convert a Series of raw timestamps to aware US/Eastern timestamps.
+
+    Offset-aware values keep their instant, naive values are read as UTC, and
+    everything comes back as US/Eastern. Unparseable values become ``NaT``.
+    """
+    timestamps = pd.to_datetime(values, utc=True, errors='coerce', format='mixed')
+    return timestamps.dt.tz_convert(EASTERN_TZ)
+
+
+def start_of_day(date):
+    """Aware datetime at UTC midnight of ``date``, matching settings.TIME_ZONE"""
+    return datetime.combine(date, time.min, tzinfo=timezone.utc)
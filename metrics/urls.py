@@ -10,6 +10,10 @@ from .views import (
     GetOvernightGapDataView,
     CollectPutCallRatioView,
     GetPutCallRatioDataView,
+    GetLatestValuesView,
+    ExportMetricsView,
+    GetAnalyticsView,
+    LiveMetricsFeedView,
 )
 
 app_name = 'metrics'
@@ -25,4 +29,8 @@ urlpatterns = [
     path('get-overnight-gaps/', GetOvernightGapDataView.as_view(), name='get_overnight_gaps'),
     path('collect-put-call-ratio/', CollectPutCallRatioView.as_view(), name='collect_put_call_ratio'),
     path('get-put-call-ratio/', GetPutCallRatioDataView.as_view(), name='get_put_call_ratio'),
+    path('latest/', GetLatestValuesView.as_view(), name='latest_values'),
+    path('export/', ExportMetricsView.as_view(), name='export'),
+    path('analytics/', GetAnalyticsView.as_view(), name='analytics'),
+    path('live/', LiveMetricsFeedView.as_view(), name='live_feed'),
 ]
\ No newline at end of file
@@ -0,0 +1,134 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import MarketMetrics, QuarantinedMetric
+from .screening import screen_frame
+from .writer import bulk_upsert_metrics
+
+logger = logging.getLogger(__name__)
+
+JUMP_SIGMA = 6
+HISTORY_SIZE = 60
+MIN_HISTORY_SIZE = 10
+
+
+def validate_frame(frame):
+    """Split a frame of raw metric rows into (valid, rejected).
+
+    Frames already screened by ``screen_frame`` (e.g. in an import worker)
+    only get the jump check, which needs stored history. ``valid`` carries
+    float values; ``rejected`` gains a ``reason`` column.
+    """
+    if 'reason' not in frame:
+        frame = screen_frame(frame)
+    frame = frame.reset_index(drop=True)
+
+    reasons = frame['reason'].to_numpy(dtype=object)
+    values = frame['value'].to_numpy(dtype=float)
+    passed = reasons == ''
+    jump = np.zeros(len(frame), dtype=bool)
+    jump[passed] = _jumps(frame[passed], values[passed])
+    reasons = np.where(jump, 'jump', reasons)
+    accepted = reasons == ''
+
+    valid = frame[accepted].assign(metric_value=values[accepted]).drop(columns=['value', 'reason'])
+    rejected = frame[~accepted].assign(reason=reasons[~accepted]).drop(columns=['value'])
+    return valid, rejected
+
+
+def _jumps(frame, values):
+    """Flag values further than JUMP_SIGMA sigma from the stored trend.
+
+    The expected value is the last stored value plus the mean stored step per
+    step since it; sigma is the standard deviation of stored steps, scaled by
+    the square root of the number of steps.
+    """
+    jump = np.zeros(len(frame), dtype=bool)
+    if frame.empty:
+        return jump
+
+    for metric_name, positions in frame.groupby('metric_name').indices.items():
+        timestamps = frame['timestamp'].iloc[positions]
+        history = np.array(
+            MarketMetrics.objects.filter(
+                metric_name=metric_name,
+                timestamp__lt=timestamps.min(),
+                metric_value__isnull=False,
+            ).order_by('-timestamp').values_list('metric_value', flat=True)[:HISTORY_SIZE],
+            dtype=float,
+        )[::-1]
+        if len(history) <= MIN_HISTORY_SIZE:
+            continue
+        step_changes = np.diff(history)
+        sigma = step_changes.std()
+        if sigma == 0:
+            continue
+
+        steps = timestamps.rank(method='first').to_numpy()
+        expected = history[-1] + step_changes.mean() * steps
+        deviation = np.abs(values[positions] - expected)
+        jump[positions] = deviation > JUMP_SIGMA * sigma * np.sqrt(steps)
+    return jump
+
+
+def quarantine(rejected):
+    """Store rejected rows in bulk with their reason codes, skipping ones already quarantined.
+
+    Returns the number of rows newly quarantined.
+    """
+    if rejected.empty:
+        return 0
+
+    started = timezone.now()
+    metric_names = rejected['metric_name'].fillna('')
+    raw_values = rejected['metric_value'].astype(object)
+    QuarantinedMetric.objects.bulk_create([
+        QuarantinedMetric(
+            timestamp=None if pd.isna(timestamp) else timestamp.to_pydatetime(),
+            metric_name=metric_name,
+            raw_value=None if pd.isna(raw_value) else str(raw_value)[:64],
+            source=None if pd.isna(source) else source,
+            reason=reason,
+        )
+        for timestamp, metric_name, raw_value, source, reason in zip(
+            rejected['timestamp'], metric_names, raw_values,
+            rejected['source'], rejected['reason'],
+        )
+    ], batch_size=1000, ignore_conflicts=True)
+
+    # ignore_conflicts hides which rows were new, so count what this call created
+    counts = dict(
+        QuarantinedMetric.objects.filter(metric_name__in=set(metric_names), created_at__gte=started)
+        .values('reason').annotate(rows=Count('id')).values_list('reason', 'rows')
+    )
+    stored = sum(counts.values())
+    if stored:
+        summary = ", ".join(f"{reason}={count}" for reason, count in sorted(counts.items()))
+        logger.warning(f"Quarantined {stored} metric rows ({summary})")
+    else:
+        logger.debug(f"All {len(rejected)} rejected metric rows were already quarantined")
+    return stored
+
+
+def ingest_frame(frame, data_type="eod"):
+    """Validate a frame, quarantine rejected rows and bulk-upsert the rest.
+
+    Returns the (valid, rejected) frames.
+    """
+    valid, rejected = validate_frame(frame)
+    quarantine(rejected)
+
+    valid = valid.drop_duplicates(subset=['timestamp', 'metric_name'], keep='last')
+    data_types = valid['data_type'] if 'data_type' in valid else [data_type] * len(valid)
+    bulk_upsert_metrics(zip(
+        pd.DatetimeIndex(valid['timestamp']).to_pydatetime(),
+        valid['metric_name'],
+        valid['metric_value'].tolist(),
+        valid['source'].astype(object).where(valid['source'].notna(), None),
+        data_types,
+    ))
+    return valid, rejected
@@ -1,17 +1,29 @@
 from django.conf import settings
 import requests
 import yfinance as yf
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from django.utils.decorators import method_decorator
+from django.utils.dateparse import parse_datetime
+from django.db.models import Count, Max
 from .models import MarketMetrics
+from .live import EVENT_FIELDS, broadcaster, metric_event
+from .latest import latest_values
+from .timestamps import to_eastern
+from .validation import ingest_frame
+from .analytics import CORRELATION_PAIR, rolling_analytics
+from .export import CONTENT_TYPES, EXPORT_FORMATS, aiter_chunks, export_rows, iter_export, parse_date_bound
+import asyncio
+import hashlib
+import json
 import logging
+import numpy as np
 import pandas as pd
 from django.utils import timezone
-from pytz import timezone as pytz_timezone
-from datetime import datetime
-import random
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -19,44 +31,26 @@ class BaseMarketDataView(View):
     """Base class for market data views"""
     start_date = "2024-01-01"
     end_date = "2024-01-31"
-    eastern_tz = pytz_timezone('US/Eastern')
     expected_trading_days = 22  # Jan 1 (New Year's) and Jan 15 (MLK Day) are holidays
 
     @method_decorator(csrf_exempt)
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
 
-    def convert_timestamp(self, timestamp):
-        """Convert timestamp to Django-compatible timezone-aware datetime"""
-        timestamp = pd.Timestamp(timestamp)
-        
-        if timestamp.tzinfo:
-            eastern_time = timestamp.tz_convert(self.eastern_tz)
-            naive_datetime = eastern_time.replace(tzinfo=None)
-        else:
-            utc_time = timestamp.tz_localize("UTC")
-            eastern_time = utc_time.tz_convert(self.eastern_tz)
-            naive_datetime = eastern_time.replace(tzinfo=None)
-            
-        return timezone.make_aware(naive_datetime, self.eastern_tz)
-
-    def store_metric(self, timestamp, metric_name, metric_value, source, data_type="eod"):
-        """Store market metric in database"""
-        try:
-            MarketMetrics.objects.update_or_create(
-                timestamp=timestamp,
-                metric_name=metric_name,
-                defaults={
-                    "metric_value": float(metric_value),
-                    "data_type": data_type,
-                    "source": source,
-                }
-            )
-            logger.info(f"Stored {metric_name} {metric_value} for {timestamp.date()}")
-            return True
-        except Exception as e:
-            logger.error(f"Error storing {metric_name} for {timestamp.date()}: {str(e)}")
-            return False
+    def store_metrics(self, timestamps, metric_name, metric_values, source, data_type="eod"):
+        """Validate and bulk-store a series of one metric, returning the number of rows stored"""
+        valid, _ = ingest_frame(self.metric_frame(timestamps, metric_name, metric_values, source), data_type)
+        logger.info(f"Stored {len(valid)} {metric_name} rows")
+        return len(valid)
+
+    def metric_frame(self, timestamps, metric_name, metric_values, source):
+        """Raw rows for the validation stage, with timestamps converted to US/Eastern"""
+        return pd.DataFrame({
+            "timestamp": to_eastern(pd.Series(timestamps)),
+            "metric_name": metric_name,
+            "metric_value": np.asarray(metric_values, dtype=object),
+            "source": source,
+        })
 
     def format_response(self, status, message, details=None):
         """Format JSON response"""
@@ -65,6 +59,59 @@ class BaseMarketDataView(View):
             response["details"] = details
         return JsonResponse(response, status=500 if status == "error" else 200)
 
+class ConditionalMetricsView(BaseMarketDataView):
+    """Base class for read views that answer conditional GETs with a 304.
+
+    The ETag and Last-Modified come from one aggregate over the
+    (metric_name, updated_at) index, so unchanged data is never loaded.
+    """
+    metric_names = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return super().dispatch(request, *args, **kwargs)
+
+        try:
+            etag, last_modified = self.get_watermark(request)
+        except Exception as e:
+            logger.error(f"Error computing write watermark: {str(e)}")
+            return super().dispatch(request, *args, **kwargs)
+
+        conditional_dispatch = condition(
+            etag_func=lambda *args, **kwargs: etag,
+            last_modified_func=lambda *args, **kwargs: last_modified,
+        )(super().dispatch)
+        return conditional_dispatch(request, *args, **kwargs)
+
+    def get_metric_names(self, request):
+        """Metrics covered by the request; empty means every metric"""
+        return self.metric_names
+
+    def get_watermark(self, request):
+        """Return (etag, last_modified) for the metrics this request covers"""
+        queryset = MarketMetrics.objects.all()
+        metric_names = self.get_metric_names(request)
+        if metric_names:
+            queryset = queryset.filter(metric_name__in=metric_names)
+        watermark = queryset.aggregate(last_modified=Max('updated_at'), row_count=Count('id'))
+
+        last_modified = watermark["last_modified"]
+        etag = self.hash_etag(
+            request.get_full_path(),
+            watermark["row_count"],
+            last_modified.isoformat() if last_modified else "",
+        )
+        return etag, last_modified
+
+    def hash_etag(self, *parts):
+        return hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()
+
+    def parse_names_param(self, request):
+        return [name for name in request.GET.get("names", "").split(",") if name]
+
+    def parse_date_param(self, request, param):
+        return parse_date_bound(request.GET.get(param), param)
+
 class CollectNQCloseView(BaseMarketDataView):
     def get(self, request):
         try:
@@ -93,15 +140,12 @@ class CollectNQCloseView(BaseMarketDataView):
                     "No data retrieved from Yahoo Finance for any ticker symbol"
                 )
 
-            successful_inserts = 0
-            for date, row in data.iterrows():
-                if self.store_metric(
-                    timestamp=self.convert_timestamp(date),
-                    metric_name="nq_close",
-                    metric_value=row["Close"],
-                    source=f"Yahoo Finance ({successful_ticker})"
-                ):
-                    successful_inserts += 1
+            successful_inserts = self.store_metrics(
+                timestamps=data.index,
+                metric_name="nq_close",
+                metric_values=data["Close"],
+                source=f"Yahoo Finance ({successful_ticker})"
+            )
 
             return self.format_response(
                 "success",
@@ -118,7 +162,9 @@ class CollectNQCloseView(BaseMarketDataView):
             logger.error(f"Error collecting NQ closing prices: {str(e)}")
             return self.format_response("error", str(e))
 
-class GetNQDataView(BaseMarketDataView):
+class GetNQDataView(ConditionalMetricsView):
+    metric_names = ('nq_close',)
+
     def get(self, request):
         try:
             start_date = datetime(2024, 1, 1)
@@ -158,15 +204,12 @@ class CollectVIXLevelView(BaseMarketDataView):
             if data.empty:
                 return self.format_response("error", f"No data retrieved for {ticker}")
 
-            successful_inserts = 0
-            for date, row in data.iterrows():
-                if self.store_metric(
-                    timestamp=self.convert_timestamp(date),
-                    metric_name="vix_level",
-                    metric_value=row["Close"],
-                    source=f"Yahoo Finance ({ticker})"
-                ):
-                    successful_inserts += 1
+            successful_inserts = self.store_metrics(
+                timestamps=data.index,
+                metric_name="vix_level",
+                metric_values=data["Close"],
+                source=f"Yahoo Finance ({ticker})"
+            )
 
             return self.format_response(
                 "success",
@@ -183,7 +226,9 @@ class CollectVIXLevelView(BaseMarketDataView):
             logger.error(f"Error collecting VIX levels: {str(e)}")
             return self.format_response("error", str(e))
 
-class GetVIXDataView(BaseMarketDataView):
+class GetVIXDataView(ConditionalMetricsView):
+    metric_names = ('vix_level',)
+
     def get(self, request):
         try:
             start_date = datetime(2024, 1, 1)
@@ -243,20 +288,14 @@ class CollectTreasuryYieldView(BaseMarketDataView):
                     "No data retrieved for 10-Year Treasury Yield from FRED"
                 )
 
-            successful_inserts = 0
-            for observation in data['observations']:
-                treasury_yield = observation['value']
-                if treasury_yield == '.' or treasury_yield is None:
-                    logger.warning(f"Skipping invalid yield value for {observation['date']}")
-                    continue
-
-                if self.store_metric(
-                    timestamp=self.convert_timestamp(observation['date']),
-                    metric_name="treasury_10y_yield",
-                    metric_value=treasury_yield,
-                    source="FRED (DGS10)"
-                ):
-                    successful_inserts += 1
+            # FRED's "." placeholders are quarantined by the validation stage
+            observations = pd.DataFrame(data['observations'])
+            successful_inserts = self.store_metrics(
+                timestamps=observations['date'],
+                metric_name="treasury_10y_yield",
+                metric_values=observations['value'],
+                source="FRED (DGS10)"
+            )
 
             return self.format_response(
                 "success",
@@ -276,7 +315,9 @@ class CollectTreasuryYieldView(BaseMarketDataView):
             logger.error(f"Error collecting 10-Year Treasury Yield: {str(e)}")
             return self.format_response("error", str(e))
 
-class GetTreasuryYieldDataView(BaseMarketDataView):
+class GetTreasuryYieldDataView(ConditionalMetricsView):
+    metric_names = ('treasury_10y_yield',)
+
     def get(self, request):
         try:
             start_date = datetime(2024, 1, 1)
@@ -321,34 +362,17 @@ class CollectOvernightGapView(BaseMarketDataView):
             if data.empty:
                 return self.format_response("error", f"No data retrieved for {ticker}")
 
-            successful_inserts = 0
-            prev_close = None
-
-            for date, row in data.iterrows():
-                if prev_close is not None:
-                    # Gap = today's open – yesterday's close
-                    gap_points = row["Open"] - prev_close
-                    gap_percent = (gap_points / prev_close) * 100 if prev_close != 0 else None
-
-                    ts = self.convert_timestamp(date)
-
-                    ok1 = self.store_metric(
-                        timestamp=ts,
-                        metric_name="overnight_gap_points",
-                        metric_value=gap_points,
-                        source=f"Yahoo Finance ({ticker})"
-                    )
-                    ok2 = self.store_metric(
-                        timestamp=ts,
-                        metric_name="overnight_gap_percent",
-                        metric_value=gap_percent,
-                        source=f"Yahoo Finance ({ticker})"
-                    )
-
-                    if ok1 and ok2:
-                        successful_inserts += 1
+            # Gap = today's open – yesterday's close; the first day has no previous close
+            prev_close = data["Close"].shift(1)
+            gap_points = data["Open"] - prev_close
+            gap_percent = gap_points / prev_close.where(prev_close != 0) * 100
+            source = f"Yahoo Finance ({ticker})"
 
-                prev_close = row["Close"]
+            valid, _ = ingest_frame(pd.concat([
+                self.metric_frame(data.index[1:], "overnight_gap_points", gap_points.iloc[1:], source),
+                self.metric_frame(data.index[1:], "overnight_gap_percent", gap_percent.iloc[1:], source),
+            ], ignore_index=True))
+            successful_inserts = int((valid.groupby("timestamp").size() == 2).sum())
 
             return self.format_response(
                 "success",
@@ -365,7 +389,9 @@ class CollectOvernightGapView(BaseMarketDataView):
             logger.error(f"Error collecting Overnight Gaps: {str(e)}")
             return self.format_response("error", str(e))
 
-class GetOvernightGapDataView(BaseMarketDataView):
+class GetOvernightGapDataView(ConditionalMetricsView):
+    metric_names = ('overnight_gap_points', 'overnight_gap_percent')
+
     def get(self, request):
         try:
             start_date = datetime(2024, 1, 1)
@@ -405,23 +431,16 @@ class CollectPutCallRatioView(BaseMarketDataView):
             
             # 🔹 Mock daily values between 0.7 and 1.2
             date_range = pd.date_range(start=self.start_date, end=self.end_date, freq="B")  # business days only
-            successful_inserts = 0
-            
-            for date in date_range:
-                # skip known holidays (NYSE closed Jan 1 and Jan 15, 2024)
-                if date.strftime("%Y-%m-%d") in ["2024-01-01", "2024-01-15"]:
-                    continue
-                
-                ts = self.convert_timestamp(date)
-                pcr_value = round(random.uniform(0.7, 1.2), 2)
-
-                if self.store_metric(
-                    timestamp=ts,
-                    metric_name="put_call_ratio",
-                    metric_value=pcr_value,
-                    source="Mock Data (no CBOE access)"
-                ):
-                    successful_inserts += 1
+            # skip known holidays (NYSE closed Jan 1 and Jan 15, 2024)
+            date_range = date_range[~date_range.strftime("%Y-%m-%d").isin(["2024-01-01", "2024-01-15"])]
+            pcr_values = np.round(np.random.uniform(0.7, 1.2, len(date_range)), 2)
+
+            successful_inserts = self.store_metrics(
+                timestamps=date_range,
+                metric_name="put_call_ratio",
+                metric_values=pcr_values,
+                source="Mock Data (no CBOE access)"
+            )
 
             return self.format_response(
                 "success",
@@ -437,7 +456,9 @@ class CollectPutCallRatioView(BaseMarketDataView):
             logger.error(f"Error collecting Put/Call ratio: {str(e)}")
             return self.format_response("error", str(e))
 
-class GetPutCallRatioDataView(BaseMarketDataView):
+class GetPutCallRatioDataView(ConditionalMetricsView):
+    metric_names = ('put_call_ratio',)
+
     def get(self, request):
         try:
             start_date = datetime(2024, 1, 1)
@@ -465,3 +486,202 @@ class GetPutCallRatioDataView(BaseMarketDataView):
         except Exception as e:
             logger.error(f"Error retrieving Put/Call ratio data: {str(e)}")
             return self.format_response("error", str(e))
+
+
+class GetLatestValuesView(ConditionalMetricsView):
+    """Latest value of each metric, served from the in-process cache"""
+    def get_watermark(self, request):
+        # Hash of the cached values themselves; only the cache's periodic check hits the database
+        results = self.serialize(self.get_latest(request))
+        return self.hash_etag(json.dumps(results, sort_keys=True)), None
+
+    def get_latest(self, request):
+        return latest_values.get(self.parse_names_param(request))
+
+    def serialize(self, latest):
+        return {
+            metric_name: {
+                "timestamp": entry["timestamp"].isoformat(),
+                "value": entry["value"],
+                "source": entry["source"]
+            } for metric_name, entry in latest.items()
+        }
+
+    def get(self, request):
+        try:
+            results = self.serialize(self.get_latest(request))
+
+            return JsonResponse({
+                "status": "success",
+                "count": len(results),
+                "data": results
+            })
+
+        except Exception as e:
+            logger.error(f"Error retrieving latest values: {str(e)}")
+            return self.format_response("error", str(e))
+
+class ExportMetricsView(ConditionalMetricsView):
+    """Stream metrics as CSV or NDJSON.
+
+    Query parameters: ``names`` (comma separated, all metrics when omitted),
+    ``start`` and ``end`` (``YYYY-MM-DD``, end exclusive), ``format``
+    (``csv`` or ``ndjson``) and ``gzip=1``.
+    """
+    def get_metric_names(self, request):
+        return self.parse_names_param(request)
+
+    def get(self, request):
+        export_format = request.GET.get("format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return JsonResponse(
+                {"status": "error", "message": f"Unsupported format '{export_format}'"},
+                status=400
+            )
+
+        try:
+            start_date = self.parse_date_param(request, "start")
+            end_date = self.parse_date_param(request, "end")
+        except ValueError as e:
+            return JsonResponse({"status": "error", "message": str(e)}, status=400)
+
+        compress = request.GET.get("gzip") in ("1", "true")
+        rows = export_rows(self.get_metric_names(request), start_date, end_date)
+        content = iter_export(rows, export_format, compress)
+        if isinstance(request, ASGIRequest):
+            # ASGI would otherwise consume a sync iterator into memory first
+            content = aiter_chunks(content)
+        response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[export_format])
+        filename = f"metrics.{export_format}" + (".gz" if compress else "")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+class GetAnalyticsView(ConditionalMetricsView):
+    """Rolling mean, volatility, z-score and NQ-VIX correlation per metric.
+
+    Query parameters: ``names`` (defaults to NQ, VIX and the 10-year yield),
+    ``window`` (observations, default 5) and ``start``/``end`` (``YYYY-MM-DD``).
+    """
+    default_metric_names = ('nq_close', 'vix_level', 'treasury_10y_yield')
+    default_window = 5
+
+    def get_metric_names(self, request):
+        return self.parse_names_param(request) or list(self.default_metric_names)
+
+    def get(self, request):
+        try:
+            window = int(request.GET.get("window", self.default_window))
+            if window < 2:
+                raise ValueError("'window' must be at least 2")
+            start_date = self.parse_date_param(request, "start")
+            end_date = self.parse_date_param(request, "end")
+        except ValueError as e:
+            return JsonResponse({"status": "error", "message": str(e)}, status=400)
+
+        try:
+            frames, correlation = rolling_analytics.get(
+                self.get_metric_names(request), window, start_date, end_date
+            )
+
+            results = {
+                metric_name: [{
+                    "timestamp": timestamp.isoformat(),
+                    **{column: self.to_json_number(value) for column, value in row.items()}
+                } for timestamp, row in frame.iterrows()]
+                for metric_name, frame in frames.items()
+            }
+
+            response = {
+                "status": "success",
+                "window": window,
+                "data": results
+            }
+            if correlation is not None:
+                response["correlation"] = {
+                    "pair": list(CORRELATION_PAIR),
+                    "data": [{
+                        "date": date.strftime("%Y-%m-%d"),
+                        "correlation": self.to_json_number(value)
+                    } for date, value in correlation.items()]
+                }
+            return JsonResponse(response)
+
+        except Exception as e:
+            logger.error(f"Error computing analytics: {str(e)}")
+            return self.format_response("error", str(e))
+
+    def to_json_number(self, value):
+        return None if value is None or np.isnan(value) else float(value)
+
+class LiveMetricsFeedView(View):
+    """Server-sent events feed of metrics as they are stored.
+
+    Subscribe with ``?names=nq_close,vix_level`` (all metrics when omitted).
+    Event ids are the rows' write times (``updated_at``); reconnecting clients
+    get every row written after ``Last-Event-ID`` or ``?since=<iso timestamp>``
+    before the live events, going back at most ``max_catch_up``. Only served
+    over ASGI.
+    """
+    keepalive_seconds = 15
+    max_catch_up = timedelta(hours=24)
+    catch_up_chunk_size = 500
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            # WSGI would buffer the endless stream and pin the worker
+            return JsonResponse(
+                {"status": "error", "message": "The live feed is only available through the ASGI server"},
+                status=501
+            )
+
+        names = [name for name in request.GET.get("names", "").split(",") if name]
+
+        since = request.headers.get("Last-Event-ID") or request.GET.get("since")
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return JsonResponse(
+                    {"status": "error", "message": "Invalid 'since' timestamp"},
+                    status=400
+                )
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            since = max(since, timezone.now() - self.max_catch_up)
+
+        response = StreamingHttpResponse(
+            self.stream_events(names, since),
+            content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream_events(self, names, since):
+        # Subscribe before the catch-up query so no write falls in between
+        subscription = broadcaster.subscribe(names)
+        try:
+            if since is not None:
+                catch_up = MarketMetrics.objects.filter(updated_at__gt=since).order_by('updated_at')
+                if names:
+                    catch_up = catch_up.filter(metric_name__in=names)
+                # values() rather than values_list(): only its iterable defers the query to aiterator's thread
+                rows = catch_up.values(*EVENT_FIELDS).aiterator(chunk_size=self.catch_up_chunk_size)
+                async for row in rows:
+                    yield self.format_event(metric_event(
+                        row['metric_name'], row['timestamp'], row['metric_value'], row['source'], row['updated_at']
+                    ))
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=self.keepalive_seconds
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield self.format_event(event)
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    def format_event(self, event):
+        return f"id: {event['updated_at']}\nevent: metric\ndata: {json.dumps(event)}\n\n"
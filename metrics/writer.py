@@ -0,0 +1,47 @@
+import logging
+
+from .latest import latest_values
+from .models import MarketMetrics
+
+logger = logging.getLogger(__name__)
+
+UPSERT_BATCH_SIZE = 1000
+
+
+def bulk_upsert_metrics(rows, batch_size=UPSERT_BATCH_SIZE):
+    """Insert or update (timestamp, metric_name, metric_value, source, data_type) rows.
+
+    Rows must be unique on (timestamp, metric_name). Returns the number of rows written.
+    """
+    objects = [
+        MarketMetrics(
+            timestamp=timestamp,
+            metric_name=metric_name,
+            metric_value=metric_value,
+            source=source,
+            data_type=data_type,
+        )
+        for timestamp, metric_name, metric_value, source, data_type in rows
+    ]
+    if not objects:
+        return 0
+
+    MarketMetrics.objects.bulk_create(
+        objects,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['timestamp', 'metric_name'],
+        update_fields=['metric_value', 'data_type', 'source', 'updated_at'],
+    )
+
+    # Only the newest row per metric can change the latest-values cache
+    newest = {}
+    for obj in objects:
+        if obj.metric_name not in newest or obj.timestamp >= newest[obj.metric_name].timestamp:
+            newest[obj.metric_name] = obj
+    for obj in newest.values():
+        latest_values.record(obj.metric_name, obj.timestamp, obj.metric_value, obj.source)
+
+    logger.info(f"Upserted {len(objects)} metric rows")
+    return len(objects)
+